@@ -5,88 +5,379 @@
 # SPDX-License-Identifier: MPL-2.0+
 # SPDX-FileCopyrightText: 2021 gucci-on-fleek
 
-import atexit
-import encodings.idna  # Required for embedded zip file
+import os
+import re
+import signal
 from argparse import ArgumentParser, FileType
-from base64 import b64encode as base64_encode
-from configparser import ConfigParser, Interpolation
-from mimetypes import guess_type as guess_mime_type
+from functools import lru_cache
 from pathlib import Path
-from tempfile import TemporaryDirectory
+from stat import S_ISDIR
 from time import sleep
-from typing import Dict, Optional, Union
-
-from selenium import webdriver
-from selenium.common.exceptions import WebDriverException
-from selenium.webdriver.firefox.webelement import FirefoxWebElement
-
-PrefsType = Dict[str, Union[bool, int]]
+from types import MappingProxyType
+from typing import (
+    TYPE_CHECKING,
+    ClassVar,
+    Dict,
+    FrozenSet,
+    Mapping,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+# Selenium is slow to import, so it (along with any other modules that are only
+# needed once the browser is launched) is only imported where it's used. This
+# way, `--help` and configuration errors don't need to wait for it.
+if TYPE_CHECKING:
+    from mmap import mmap
+
+    from selenium import webdriver
+    from selenium.webdriver.firefox.options import Options
+    from selenium.webdriver.firefox.webelement import FirefoxWebElement
+
+PrefsType = Dict[str, Union[bool, int, str]]
 # JS has primitive types that match all of these, so it's trivial to translate them from Python to JS
 JavascriptTypes = Union[int, bool, str, float, dict, list]
+ConfigType = Dict[str, Dict[str, str]]
+
+INI_SECTION = re.compile(r"^\[([^\]]+)\]")
+# Like ConfigParser, the key is everything before the first `=` or `:`
+INI_OPTION = re.compile(r"^([^=:;#\s][^=:]*?)\s*[=:]\s*(.*)$")
+
+CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    / "blackboard_collaborate"
+)
+
+USER_CHROME_CSS = (
+    # Hide the URL bar and the tab bar
+    b"#nav-bar,#tabbrowser-tabs{height:0!important;min-height:0!important;overflow:hidden!important}"
+    # Match the titlebar with the BB Collab background
+    b"#navigator-toolbox{background:#262626!important;border-bottom:0!important}"
+)
 
 
 class WebBrowser:
     """Controls a Firefox web browser."""
 
+    DEFAULT_PREFS: ClassVar[Mapping[str, Union[bool, int, str]]] = MappingProxyType(
+        {
+            "media.navigator.streams.fake": True,  # Use a fake webcam and microphone to avoid permission issues
+            # Always open links and popups inline (in the same tab/window)
+            "browser.link.open_newwindow": 1,
+            "browser.link.open_newwindow.restriction": 0,
+            "media.autoplay.default": 0,  # Allow audio to play
+            # Turn off the background services that we don't need, so that they don't slow down startup
+            "app.update.enabled": False,
+            "browser.newtabpage.enabled": False,
+            "browser.safebrowsing.downloads.enabled": False,
+            "browser.safebrowsing.malware.enabled": False,
+            "browser.safebrowsing.phishing.enabled": False,
+            "browser.startup.homepage_override.mstone": "ignore",
+            "datareporting.healthreport.uploadEnabled": False,
+            "datareporting.policy.dataSubmissionEnabled": False,
+            "extensions.formautofill.addresses.enabled": False,
+            "extensions.formautofill.creditCards.enabled": False,
+            "extensions.update.enabled": False,
+            "signon.rememberSignons": False,
+            "toolkit.telemetry.enabled": False,
+        }
+    )
+
+    # How long to wait for elements to appear, and how often to check for them, in seconds
+    WAIT_TIMEOUT = 45
+    WAIT_POLL_FREQUENCY = 0.25
+    # Buttons found by their text are normally already rendered by the time we
+    # look for them, or appear very shortly after. Each check is a single
+    # command to the browser, so poll for them much more often.
+    SHORT_WAIT_TIMEOUT = 10
+    TEXT_WAIT_POLL_FREQUENCY = 0.05
+
     def __init__(
         self,
-        extra_prefs: PrefsType = {},
+        extra_prefs: Optional[PrefsType] = None,
         firefox_profile_path: Optional[Path] = None,
         driver_path: str = "geckodriver",
+        headless: bool = False,
+        shared: bool = False,
+        remote_url: Optional[str] = None,
+        page_load_strategy: str = "eager",
+        maximize: bool = True,
+        window_size: Optional[Tuple[int, int]] = None,
     ) -> None:
         """Initializes and launches Firefox.
 
         Args:
             extra_prefs (PrefsType, optional): Any additional settings to be set in
-              "about:config". Defaults to {}.
+              "about:config", on top of `DEFAULT_PREFS`. Defaults to None.
             firefox_profile_path (Path, optional): A path to a Firefox profile
-              directory. Defaults to None.
+              directory, which is used in place and kept between runs. Defaults
+              to None (a fresh temporary profile).
             driver_path (str, optional): The path to the `geckodriver` binary.
               Defaults to "geckodriver".
+            headless (bool, optional): Run Firefox without any window. Defaults
+              to False.
+            shared (bool, optional): Use a `geckodriver` server that is shared
+              between launches, instead of starting a new one. Defaults to False.
+            remote_url (str, optional): The URL of an already running `geckodriver`
+              server to use, instead of starting a new one. Defaults to None.
+            page_load_strategy (str, optional): When navigating to a page is
+              considered finished: "normal" waits for the whole page to load,
+              "eager" only waits for the DOM, and "none" doesn't wait at all.
+              Defaults to "eager" since we explicitly wait for any elements that
+              we need.
+            maximize (bool, optional): Maximize the window once Firefox has
+              started. Defaults to True.
+            window_size (Tuple[int, int], optional): The width and height to open
+              the window with. Defaults to None (Firefox's default size).
         """
-        self.options = webdriver.firefox.options.Options()
-        if firefox_profile_path:
-            self.options.profile = firefox_profile_path
+        import encodings.idna  # Required for embedded zip file, once we connect to `geckodriver`
+
+        from selenium import webdriver
+        from selenium.common.exceptions import SessionNotCreatedException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        self.options = self._build_options(
+            # `True == 1` and `False == 0`, but Firefox's prefs are typed, so
+            # include each value's type to keep them apart in the cache
+            frozenset(
+                (key, type(value), value) for key, value in (extra_prefs or {}).items()
+            ),
+            str(firefox_profile_path) if firefox_profile_path else None,
+            headless,
+            page_load_strategy,
+            window_size,
+        )
 
-        self.prefs = {
-            "media.navigator.streams.fake": True,  # Use a fake webcam and microphone to avoid permission issues
-            # Always open links and popups inline (in the same tab/window)
-            "browser.link.open_newwindow": 1,
-            "browser.link.open_newwindow.restriction": 0,
-            "media.autoplay.default": 0,  # Allow audio to play
-        }
+        self.driver: "webdriver.Remote"
+        if remote_url:
+            self.driver = self._connect_remote_driver(remote_url)
+        elif shared:
+            try:
+                self.driver = self._connect_shared_driver(driver_path)
+            except SessionNotCreatedException:
+                # `geckodriver` only runs one session at once, so another launch must be using it
+                shared = False
+        if not (remote_url or shared):
+            self.driver = webdriver.Firefox(
+                options=self.options, executable_path=driver_path
+            )
 
-        for key, value in {**self.prefs, **extra_prefs}.items():
-            self.options.set_preference(key, value)
+        self._firefox_pidfd: Optional[int] = None
+        # A `remote_url` server may be on another computer or in a container,
+        # where the process ID means something else, so only trust the process
+        # ID when we started `geckodriver` ourselves
+        if not remote_url:
+            # Open it now, while Firefox is known to be running, so that it can't
+            # refer to another process that has reused the process ID
+            self._firefox_pidfd = self._open_pidfd(
+                self.driver.capabilities.get("moz:processID")
+            )
 
-        self.driver = webdriver.Firefox(
-            options=self.options, executable_path=driver_path
+        # These are explicit waits since an implicit wait slows down every other
+        # command. They're reused for every lookup.
+        self._wait = WebDriverWait(
+            self.driver, self.WAIT_TIMEOUT, poll_frequency=self.WAIT_POLL_FREQUENCY
         )
-        # Search for each element for at most 45 seconds before giving up
-        self.driver.implicitly_wait(45)
-        self.driver.maximize_window()
-        atexit.register(self.__exit__)
-
+        self._wait_text = WebDriverWait(
+            self.driver,
+            self.WAIT_TIMEOUT,
+            poll_frequency=self.TEXT_WAIT_POLL_FREQUENCY,
+        )
+        self._wait_text_short = WebDriverWait(
+            self.driver,
+            self.SHORT_WAIT_TIMEOUT,
+            poll_frequency=self.TEXT_WAIT_POLL_FREQUENCY,
+        )
+        if maximize:
+            self.driver.maximize_window()
         self.localstorage = self._LocalStorage(self)
 
+    def _connect_shared_driver(self, driver_path: str) -> "webdriver.Remote":
+        """Connect to our shared `geckodriver` server, starting it if it isn't running.
+
+        The server is detached from this process so that it keeps running for
+        the next launch. Its process ID and port are kept in a private file, so
+        that we only ever send our password to the server that we started.
+        """
+        import socket
+        import subprocess
+
+        from selenium.common.exceptions import WebDriverException
+
+        state_path = CACHE_DIR / "geckodriver"
+        port = self._shared_driver_port(state_path)
+        if not port:
+            with socket.socket() as probe:  # Let the system pick a free port
+                probe.bind(("127.0.0.1", 0))
+                port = probe.getsockname()[1]
+            try:
+                driver = subprocess.Popen(
+                    [driver_path, "--port", str(port)],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    start_new_session=True,
+                    creationflags=getattr(subprocess, "DETACHED_PROCESS", 0),  # Windows only
+                )
+            except FileNotFoundError as error:
+                # The same error that `webdriver.Firefox` gives
+                raise WebDriverException(
+                    f"'{os.path.basename(driver_path)}' executable needs to be in PATH."
+                ) from error
+
+            CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+            state = os.open(state_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(state, "w") as file:
+                file.write(f"{driver.pid} {port}")
+
+            for _ in range(200):  # Wait for at most 10 seconds for it to start
+                try:
+                    socket.create_connection(("127.0.0.1", port)).close()
+                    break
+                except OSError:
+                    sleep(0.05)
+
+        return self._connect_remote_driver(f"http://127.0.0.1:{port}")
+
+    @staticmethod
+    def _shared_driver_port(state_path: Path) -> Optional[int]:
+        """Get the port of our shared `geckodriver` server, or None if it isn't running."""
+        import socket
+
+        try:
+            pid, port = map(int, state_path.read_text().split())
+            if os.name != "nt":  # On Windows, `os.kill` always terminates the process
+                os.kill(pid, 0)  # Fails if it has exited, or belongs to another user
+            socket.create_connection(("127.0.0.1", port)).close()
+        except (OSError, ValueError):
+            return None
+
+        try:
+            command_line = Path(f"/proc/{pid}/cmdline").read_bytes()
+        except OSError:  # There's no `/proc` here
+            return port
+        # Make sure that the process ID hasn't been reused by another program
+        return port if f"--port\0{port}\0".encode() in command_line else None
+
+    def _connect_remote_driver(self, remote_url: str) -> "webdriver.Remote":
+        """Start a new session on a `geckodriver` server that is already running."""
+        from selenium import webdriver
+
+        # Keep the connection open between commands, like `webdriver.Firefox` does
+        return webdriver.Remote(
+            command_executor=remote_url, options=self.options, keep_alive=True
+        )
+
+    @classmethod
+    @lru_cache(maxsize=4)
+    def _build_options(
+        cls,
+        extra_prefs: FrozenSet[Tuple[str, type, Union[bool, int, str]]],
+        firefox_profile_path: Optional[str],
+        headless: bool,
+        page_load_strategy: str,
+        window_size: Optional[Tuple[int, int]],
+    ) -> "Options":
+        """Build the options for Firefox.
+
+        This is cached so that launching several browsers from the same process
+        with the same settings only builds them once. The returned object is
+        shared, so it must not be modified.
+        """
+        from selenium.webdriver.firefox.options import Options
+
+        options = Options()
+        options.headless = headless
+        options.set_capability("pageLoadStrategy", page_load_strategy)
+        if window_size:
+            options.add_argument(f"--width={window_size[0]}")
+            options.add_argument(f"--height={window_size[1]}")
+        if firefox_profile_path:
+            # Setting `options.profile` would make Selenium copy and zip the whole
+            # profile on every launch, so have Firefox use it directly instead.
+            options.add_argument("-profile")
+            options.add_argument(firefox_profile_path)
+
+        # `set_preference` only stores each pref in this dict, so set them all
+        # directly. The extra prefs are applied second so that they take precedence.
+        options.preferences.update(cls.DEFAULT_PREFS)
+        options.preferences.update((key, value) for key, _, value in extra_prefs)
+        return options
+
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
-        self.driver.__exit__()
-        atexit.unregister(self.__exit__)
+        try:
+            self.driver.quit()
+        finally:
+            if self._firefox_pidfd is not None:
+                try:
+                    self._kill_firefox()
+                finally:
+                    os.close(self._firefox_pidfd)
+                    self._firefox_pidfd = None
+
+    @staticmethod
+    def _open_pidfd(pid: Optional[int]) -> Optional[int]:
+        """Get a Linux pidfd for a process, or None if this isn't supported.
+
+        Unlike its process ID, a pidfd always refers to the same process.
+        """
+        if not pid or not hasattr(os, "pidfd_open"):
+            return None
+        try:
+            return os.pidfd_open(pid)
+        except OSError:  # The process has already exited, or the kernel is too old
+            return None
+
+    def _kill_firefox(self, timeout: float = 5) -> None:
+        """Kills Firefox if it is still running `timeout` seconds after quitting.
+
+        `geckodriver` normally closes Firefox itself, but it leaves it running if
+        `geckodriver` is killed first.
+        """
+        import select
+
+        if not hasattr(signal, "pidfd_send_signal"):
+            return
+        poller = select.poll()
+        poller.register(self._firefox_pidfd, select.POLLIN)  # Readable once it exits
+        if not poller.poll(timeout * 1000):
+            try:
+                signal.pidfd_send_signal(self._firefox_pidfd, signal.SIGKILL)
+            except OSError:  # Firefox has just exited, or it belongs to another user
+                pass
 
     def navigate_to_url(self, url: str) -> None:
         """Navigate the browser to a url."""
         self.driver.get(url)
 
-    def element_by_id(self, id: str) -> FirefoxWebElement:
-        """Get an element on a webpage by its `id`."""
-        return self.driver.find_element_by_id(id)
+    def element_by_id(self, id: str) -> "FirefoxWebElement":
+        """Get an element on a webpage by its `id`, without waiting for it."""
+        from selenium.webdriver.common.by import By
+
+        return self.driver.find_element(By.ID, id)
+
+    def wait_for_id(self, id: str) -> "FirefoxWebElement":
+        """Get an element on a webpage by its `id`, waiting for it to appear."""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.expected_conditions import (
+            presence_of_element_located,
+        )
+
+        return self._wait.until(presence_of_element_located((By.ID, id)))
 
     def element_by_text(
-        self, text: str, element_type: str = "*", full_text: bool = True
-    ) -> FirefoxWebElement:
+        self,
+        text: str,
+        element_type: str = "*",
+        full_text: bool = True,
+        long_wait: bool = False,
+        clickable: bool = False,
+    ) -> "FirefoxWebElement":
         """Select an element on a webpage by its text contents.
 
         Args:
@@ -96,14 +387,41 @@ class WebBrowser:
             full_text (bool, optional): Specifies if `text` is full or
               partial text contents of the element. Defaults to True
               (full and exact match).
+            long_wait (bool, optional): Wait as long as `wait_for_id` does for
+              the element to appear, instead of only a few seconds. Defaults to False.
+            clickable (bool, optional): Also wait until the element is visible
+              and enabled. Defaults to False.
         """
-        if full_text:
-            xpath = f'//{element_type}[text()="{text}"]'
-        else:
-            xpath = f'//{element_type}[contains(text(), "{text}")]'
-        return self.driver.find_element_by_xpath(xpath)
+        wait = self._wait_text if long_wait else self._wait_text_short
+        # Search the page's text in the browser itself, instead of evaluating an
+        # XPath. Each attempt is then a single command, and the lookup also works
+        # when `text` contains quotes.
+        return wait.until(
+            lambda driver: driver.execute_script(
+                """
+                const [text, element_type, full_text, clickable] = arguments;
+                const walker = document.createTreeWalker(document, NodeFilter.SHOW_TEXT);
+                while (walker.nextNode()) {
+                    const node = walker.currentNode;
+                    const element = node.parentElement;
+                    if (
+                        (full_text ? node.data === text : node.data.includes(text)) &&
+                        (element_type === "*" || element.localName === element_type) &&
+                        (!clickable || (element.getClientRects().length && !element.disabled))
+                    ) {
+                        return element;
+                    }
+                }
+                return null;
+                """,
+                text,
+                element_type,
+                full_text,
+                clickable,
+            )
+        )
 
-    def click(self, element: FirefoxWebElement) -> None:
+    def click(self, element: "FirefoxWebElement") -> None:
         """Simulate a click on an element.
 
         We are using this instead of `element.click()` because this works even if the element is obscured or blocked.
@@ -118,34 +436,152 @@ class WebBrowser:
         def __init__(self, outer: "WebBrowser") -> None:
             self.outer = outer
 
-        def __setitem__(self, key: JavascriptTypes, value: JavascriptTypes) -> None:
+        def __setitem__(self, key: str, value: JavascriptTypes) -> None:
             """Set a value in the browser's `localstorage`."""
-            self.outer.driver.execute_script(
-                "window.localStorage.setItem(arguments[0], arguments[1]);", key, value
-            )
+            self.update({key: value})
 
         def __getitem__(self, key: JavascriptTypes) -> None:
             NotImplemented
 
+        def update(self, items: Dict[str, JavascriptTypes]) -> None:
+            """Set multiple values in the browser's `localstorage` at once.
+
+            This only needs a single round trip to the browser. Values that
+            aren't strings are stored as JSON.
+            """
+            self.outer.driver.execute_script(
+                """
+                for (const [key, value] of Object.entries(arguments[0])) {
+                    window.localStorage.setItem(
+                        key, typeof value === "string" ? value : JSON.stringify(value)
+                    );
+                }
+                """,
+                items,
+            )
+
     @staticmethod
-    def bytes_to_data_uri(data: bytes, mimetype: Optional[str]) -> str:
-        """Convert a bytes object into a data URI that can be opened
+    def bytes_to_data_uri(data: Union[bytes, "mmap"], mimetype: Optional[str]) -> str:
+        """Convert a bytes-like object into a data URI that can be opened
         in a web browser.
         """
+        from base64 import b64encode as base64_encode
+
         if not mimetype:
             mimetype = "application/octet-stream"  # A somewhat reasonable fallback if we can't guess
-        encoded = base64_encode(data).strip(b"=").decode("ascii")
-        return f"data:{mimetype};base64,{encoded}"
+        return f"data:{mimetype};base64,{base64_encode(data).decode('ascii')}"
 
     def wait_until_window_close(self) -> None:
-        """Blocks until the browser window closes."""
+        """Blocks until the browser window closes.
+
+        Where possible, we sleep until the Firefox process exits. Otherwise, we
+        leave an asynchronous script running that never finishes. Marionette
+        fails it as soon as the window is closed, so either way this wakes up
+        immediately.
+
+        This returns early on Ctrl+C, or raises `SystemExit` if the process is
+        terminated (see `exit_on_sigterm`), so that the browser is still closed.
+        """
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+
+        if self._wait_until_firefox_exit():
+            return
+
+        # `geckodriver` runs one command at a time, so quitting has to wait for the
+        # pending script to finish. Restart the script every few seconds so that
+        # the browser can be closed promptly if we are interrupted.
+        self.driver.set_script_timeout(5)
         try:
             while True:
-                sleep(5)
-                self.driver.get_window_position()
+                try:
+                    self.driver.execute_async_script("")  # Never calls its callback
+                except TimeoutException:
+                    continue
+                except WebDriverException:
+                    # The script is also stopped if the page navigates, so make sure that the window is really gone
+                    self.driver.get_window_position()
         except (WebDriverException, KeyboardInterrupt):
             return
 
+    def _wait_until_firefox_exit(self) -> bool:
+        """Blocks until the Firefox process exits, using a Linux pidfd.
+
+        Returns False without waiting if this isn't supported.
+        """
+        import select
+
+        if self._firefox_pidfd is None:
+            return False
+        poller = select.poll()
+        poller.register(self._firefox_pidfd, select.POLLIN)  # Readable once it exits
+        try:
+            poller.poll()
+        except KeyboardInterrupt:
+            pass
+        return True
+
+
+def shared_memory_profile_path() -> Optional[Path]:
+    """Get a path for the profile in a private `/dev/shm` directory, or None.
+
+    `/dev/shm` is writable by everyone, so the directory is only used if it
+    belongs to us.
+    """
+    if not hasattr(os, "getuid"):
+        return None
+    path = Path(f"/dev/shm/blackboard_collaborate-{os.getuid()}")
+    try:
+        path.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    except OSError:  # There's no `/dev/shm`
+        return None
+
+    info = path.lstat()
+    if not S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        return None
+    return path / "profile"
+
+
+def firefox_profile_in_use(profile_path: Path) -> bool:
+    """Check if a running Firefox has locked a profile directory.
+
+    Firefox holds an `fcntl` lock on `.parentlock` on Linux and macOS, and
+    keeps `parent.lock` open exclusively on Windows.
+    """
+    lock_name = "parent.lock" if os.name == "nt" else ".parentlock"
+    try:
+        lock = os.open(profile_path / lock_name, os.O_RDWR)
+    except FileNotFoundError:
+        return False
+    except PermissionError:  # Windows won't open a file that is open exclusively
+        return True
+
+    try:
+        if os.name != "nt":
+            import fcntl
+
+            fcntl.lockf(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return True
+    finally:
+        os.close(lock)  # This also releases our lock
+    return False
+
+
+def exit_on_sigterm() -> None:
+    """Exit cleanly when the process is terminated.
+
+    By default, SIGTERM (from `systemctl stop`, `docker stop`, etc.) kills
+    Python immediately, so the browser would be left running. Raising
+    `SystemExit` instead lets `WebBrowser.__exit__` close it first.
+    """
+
+    def handler(signum, frame):
+        raise SystemExit(128 + signum)
+
+    signal.signal(signal.SIGTERM, handler)
+
 
 class BlackboardCollaborate(WebBrowser):
     """Accesses Blackboard Collaborate Ultra."""
@@ -168,13 +604,26 @@ class BlackboardCollaborate(WebBrowser):
     def sign_in(self, username: str, password: str) -> None:
         """Sign in to the Blackboard Website."""
         self.navigate_to_url(self.base_url)
-
-        self.element_by_id("user_id").send_keys(username)
-        self.element_by_id("password").send_keys(password)
-        self.click(self.element_by_id("entry-login"))
+        # The page may still be rendering the form or redirecting, since navigating only waits for the DOM
+        self.wait_for_id("user_id")
+
+        # Fill in and submit the login form in a single command instead of one for each field
+        self.driver.execute_script(
+            """
+            for (const [id, value] of [["user_id", arguments[0]], ["password", arguments[1]]]) {
+                const field = document.getElementById(id);
+                field.value = value;
+                // Let any of the page's scripts know that the field has changed, like typing would
+                field.dispatchEvent(new Event("input", { bubbles: true }));
+            }
+            document.getElementById("entry-login").click();
+            """,
+            username,
+            password,
+        )
 
         # Wait until the homepage loads after login (the logout button can only appear after we have successfully logged in)
-        self.element_by_id("topframe.logout.label")
+        self.wait_for_id("topframe.logout.label")
 
     def launch_collaborate(self, course_id: str, launch_button: str) -> None:
         """Launch Blackboard Collaborate Ultra."""
@@ -182,11 +631,12 @@ class BlackboardCollaborate(WebBrowser):
             f"{self.base_url}/webapps/collab-ultra/tool/collabultra?course_id={course_id}"
         )
 
-        self.driver.switch_to.frame(self.element_by_id("collabUltraLtiFrame"))
-        self.click(self.element_by_text(launch_button))
-        sleep(1)  # Wait after clicking to let the page's JavaScript run
+        self.driver.switch_to.frame(self.wait_for_id("collabUltraLtiFrame"))
+        # The frame's contents are loaded separately, so this may take a while to appear
+        self.click(self.element_by_text(launch_button, long_wait=True, clickable=True))
 
-        self.click(self.element_by_text("Join", full_text=False))
+        # Wait for the page's JavaScript to enable the button after clicking
+        self.click(self.element_by_text("Join", full_text=False, clickable=True))
         self.driver.switch_to.default_content()  # Switch out of the `iframe`
 
     def configure_collaborate(self, profile_picture: Optional[str] = None) -> None:
@@ -198,23 +648,40 @@ class BlackboardCollaborate(WebBrowser):
             profile_picture (str, optional): The filesystem path to a profile picture.
               Defaults to None.
         """
-        self.element_by_id("site-loading")
-        # Skip the "Check your Microphone" screen
-        self.localstorage["techcheck.initial-techcheck"] = "complete"
-        self.localstorage["techcheck.status"] = "complete"
-        # Skip the tutorial
-        self.localstorage["ftue.announcement.introduction"] = True
-        self.localstorage["chat.defaultchannel"] = "everyone"
-        # Hide the annoying "X person joined/left" notifications
-        self.localstorage["profile.notification.roster.visual"] = False
+        import mimetypes
+        from mmap import ACCESS_READ, mmap
+
+        settings: Dict[str, JavascriptTypes] = {
+            # Skip the "Check your Microphone" screen
+            "techcheck.initial-techcheck": "complete",
+            "techcheck.status": "complete",
+            # Skip the tutorial
+            "ftue.announcement.introduction": True,
+            "chat.defaultchannel": "everyone",
+            # Hide the annoying "X person joined/left" notifications
+            "profile.notification.roster.visual": False,
+        }
 
+        # Read the profile picture while Collaborate is still loading, instead of after
         if profile_picture:
-            mimetype = guess_mime_type(profile_picture)
+            # Check the built-in types first, since `guess_type` reads all of the
+            # system's `mime.types` files the first time that it's called
+            mimetype = mimetypes.types_map.get(Path(profile_picture).suffix.lower())
+            if not mimetype:
+                mimetype, _ = mimetypes.guess_type(profile_picture)
             with open(profile_picture, "rb") as file:
-                profile_picture_uri = self.bytes_to_data_uri(file.read(), mimetype[0])
-            self.localstorage["profile.avatar"] = profile_picture_uri
+                if os.fstat(file.fileno()).st_size > 1024 * 1024:
+                    # Encode large pictures straight from the page cache, instead of copying them into memory first
+                    with mmap(file.fileno(), 0, access=ACCESS_READ) as data:
+                        profile_picture_uri = self.bytes_to_data_uri(data, mimetype)
+                else:
+                    profile_picture_uri = self.bytes_to_data_uri(file.read(), mimetype)
+            settings["profile.avatar"] = profile_picture_uri
 
-        self.click(self.element_by_id("side-panel-open"))  # Open the chat by default
+        self.wait_for_id("site-loading")
+        self.localstorage.update(settings)
+
+        self.click(self.wait_for_id("side-panel-open"))  # Open the chat by default
 
     @classmethod
     def run_all(
@@ -224,11 +691,14 @@ class BlackboardCollaborate(WebBrowser):
         username: str,
         password: str,
         hide_ui: bool = False,
+        headless: bool = False,
         raspberry_pi: bool = False,
         course_id: str,
         launch_button: str,
         driver_path: str = "geckodriver",
         profile_picture: Optional[str] = None,
+        shared: bool = False,
+        remote_url: Optional[str] = None,
     ) -> None:
         """Run all of the steps necessary to log in to Blackboard Collaborate Ultra.
 
@@ -243,10 +713,16 @@ class BlackboardCollaborate(WebBrowser):
               Defaults to "geckodriver".
             hide_ui (bool, optional): Whether or not to hide the browser's UI.
               Defaults to False.
+            headless (bool, optional): Whether or not to run the browser without
+              any window, for audio-only use. Defaults to False.
             raspberry_pi (bool, optional): Whether or not we are are running on a Pi.
               Defaults to False.
             profile_picture (str, optional): The filesystem path to a profile picture.
               Defaults to None.
+            shared (bool, optional): Whether or not to share one `geckodriver`
+              server between launches. Defaults to False.
+            remote_url (str, optional): The URL of an already running `geckodriver`
+              server to use. Defaults to None.
         """
         extra_prefs: PrefsType = {}
 
@@ -263,64 +739,190 @@ class BlackboardCollaborate(WebBrowser):
                 }
             )
 
+        if headless:
+            # Nothing is displayed, so don't bother loading any images
+            extra_prefs["permissions.default.image"] = 2
+
         firefox_profile_path: Optional[Path] = None
-        if hide_ui:
+        temporary_profile: Optional[Path] = None
+        if hide_ui and not headless:  # There's no UI to hide in headless mode
+            from hashlib import blake2b
+            from tempfile import mkdtemp
+
             extra_prefs.update(
                 {
                     "toolkit.legacyUserProfileCustomizations.stylesheets": True,  # Enable userChrome.css
+                    # Firefox may have been killed last time, so don't reopen the previous session
+                    "browser.sessionstore.resume_from_crash": False,
+                    "browser.startup.page": 0,
                 }
             )
 
-            tempdir = TemporaryDirectory()
-            atexit.register(tempdir.cleanup)
-            firefox_profile_path = Path(tempdir.name)
-
-            (firefox_profile_path / "chrome").mkdir()
-            with open(
-                firefox_profile_path / "chrome/userChrome.css", "wt"
-            ) as user_chrome:
-                user_chrome.write(
-                    """
-                    #nav-bar, #tabbrowser-tabs { /* Hide the URL bar and the tab bar */
-                        height: 0px !important;
-                        min-height: 0px !important;
-                        overflow: hidden !important;
-                    }
-                    #navigator-toolbox { /* Match the titlebar with the BB Collab background */
-                        background: #262626 !important;
-                        border-bottom: 0px !important;
-                    }
-                    """
+            # Reuse the same profile for every launch so that Firefox's caches survive between runs
+            firefox_profile_path = CACHE_DIR / "profile"
+            if raspberry_pi:
+                # Keep the profile in memory so that Firefox's cache writes don't wear out the SD card
+                shm_profile_path = shared_memory_profile_path()
+                if shm_profile_path:
+                    firefox_profile_path = shm_profile_path
+                    # The disk cache can grow to about 1 GB, which would all be kept in RAM until reboot
+                    extra_prefs["browser.cache.disk.enable"] = False
+
+            if firefox_profile_in_use(firefox_profile_path):
+                # Another launch is still running, so give this one its own profile
+                temporary_profile = Path(mkdtemp(prefix="blackboard_collaborate-"))
+                firefox_profile_path = temporary_profile
+            else:
+                # The profile holds the session cookies, so keep it private
+                firefox_profile_path.parent.mkdir(
+                    mode=0o700, parents=True, exist_ok=True
+                )
+                firefox_profile_path.mkdir(mode=0o700, exist_ok=True)
+                firefox_profile_path.chmod(0o700)  # In case an older version created it
+
+                # Always start signed out, so that `sign_in` finds the login form
+                for cookies in (
+                    "cookies.sqlite",
+                    "cookies.sqlite-wal",
+                    "cookies.sqlite-shm",
+                ):
+                    try:
+                        (firefox_profile_path / cookies).unlink()
+                    except FileNotFoundError:
+                        pass
+
+            chrome_path = firefox_profile_path / "chrome"
+            user_chrome_path = chrome_path / "userChrome.css"
+            css_hash_path = chrome_path / ".css.hash"
+            css_hash = blake2b(USER_CHROME_CSS).hexdigest()
+            try:
+                # Check the mtime too, in case the CSS file was edited or removed since we last wrote it
+                css_unchanged = (
+                    css_hash_path.read_text()
+                    == f"{css_hash} {user_chrome_path.stat().st_mtime_ns}"
+                )
+            except OSError:
+                css_unchanged = False
+
+            # Only rewrite the CSS when it changes so that Firefox doesn't need to rebuild its caches
+            if not css_unchanged:
+                chrome_path.mkdir(parents=True, exist_ok=True)
+                user_chrome = os.open(
+                    user_chrome_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644
+                )
+                try:
+                    os.write(user_chrome, USER_CHROME_CSS)
+                finally:
+                    os.close(user_chrome)
+                css_hash_path.write_text(
+                    f"{css_hash} {user_chrome_path.stat().st_mtime_ns}"
                 )
 
-        with cls(
-            base_url,
-            extra_prefs,
-            firefox_profile_path,
-            driver_path,
-        ) as browser:
-            browser.sign_in(username, password)
-            browser.launch_collaborate(course_id, launch_button)
-            browser.configure_collaborate(profile_picture)
-            browser.wait_until_window_close()
-
-
-class BooleanCoercingInterpolation(Interpolation):
-    """Convert any 'stringified' boolean values into 'true' booleans."""
-
-    BOOLEANS = {"true": True, "false": False}
-
-    def before_get(self, parser, section, option, value, defaults) -> Union[bool, str]:  # type: ignore
-        """Override the default ConfigParser behavior so that a proper Boolean
-        is returned when a value containing "True"/"False" is requested.
+        try:
+            with cls(
+                base_url,
+                extra_prefs,
+                firefox_profile_path,
+                driver_path,
+                headless=headless,
+                shared=shared,
+                remote_url=remote_url,
+                # A headless window can be given its size upfront, so it doesn't need to be maximized afterwards
+                maximize=not headless,
+                window_size=(1920, 1080) if headless else None,
+            ) as browser:
+                browser.sign_in(username, password)
+                browser.launch_collaborate(course_id, launch_button)
+                browser.configure_collaborate(profile_picture)
+                browser.wait_until_window_close()
+        finally:
+            if temporary_profile:
+                from shutil import rmtree
+
+                rmtree(temporary_profile, ignore_errors=True)
+
+
+class FastIni:
+    """A minimal parser for the launcher's flat INI config file.
+
+    This is used instead of ConfigParser because our config file is tiny, and
+    ConfigParser's line-by-line state machine is comparatively slow to import
+    and run.
+    """
+
+    DEFAULT_SECTION = "General"
+    # Listing each spelling saves casefolding every value just to check if it's a boolean
+    BOOLEANS = {
+        "true": True,
+        "True": True,
+        "TRUE": True,
+        "false": False,
+        "False": False,
+        "FALSE": False,
+    }
+
+    def read(self, file: TextIO) -> ConfigType:
+        """Parse an INI file into a dict of sections.
+
+        As with ConfigParser, keys are case-insensitive and are separated from
+        their values by `=` or `:`. The values are left as strings; use
+        `section` to get a section ready for use.
+
+        Raises:
+            ValueError: If a line can't be parsed, if a section or key is
+              repeated, or if an indented line follows a key (ConfigParser would
+              continue the key's value, but multi-line values aren't supported).
+        """
+        sections: ConfigType = {self.DEFAULT_SECTION: {}}
+        current = sections[self.DEFAULT_SECTION]
+        seen_sections = set()
+        after_key = False
+        source = getattr(file, "name", "<config>")
+
+        for number, raw_line in enumerate(file.read().splitlines(), start=1):
+            line = raw_line.strip()
+            if not line or line[0] in "#;":
+                continue
+            if after_key and raw_line[0].isspace():
+                raise ValueError(
+                    f"{source}, line {number}: values can't continue onto indented lines"
+                )
 
-        This is used instead of ConfigParser.getBoolean because using the Mapping
-        protocol is much more "Pythonic" than using a getter.
+            section = INI_SECTION.match(line)
+            if section:
+                if section[1] in seen_sections:
+                    raise ValueError(
+                        f"{source}, line {number}: section [{section[1]}] is repeated"
+                    )
+                seen_sections.add(section[1])
+                after_key = False
+                current = sections.setdefault(section[1], {})
+                continue
+
+            option = INI_OPTION.match(line)
+            if not option:
+                raise ValueError(
+                    f"{source}, line {number}: expected a [section] or a key = value, not {line!r}"
+                )
+            key, value = option.groups()
+            key = key.casefold()
+            if key in current:
+                raise ValueError(f"{source}, line {number}: key {key!r} is repeated")
+            current[key] = value
+            after_key = True
+
+        return sections
+
+    def section(self, conf: ConfigType, name: str) -> Dict[str, Union[bool, str]]:
+        """Get a section from a parsed INI file.
+
+        The keys in the `[General]` section are applied to the section, and any
+        'stringified' boolean values are converted into 'true' booleans. This is
+        only done for the section that is actually used, instead of for every
+        section in the file.
         """
-        try:
-            return self.BOOLEANS[value.casefold()]
-        except KeyError:
-            return value
+        options = {**conf[self.DEFAULT_SECTION], **conf[name]}
+        return {key: self.BOOLEANS.get(value, value) for key, value in options.items()}
 
 
 if __name__ == "__main__":
@@ -340,17 +942,23 @@ if __name__ == "__main__":
         help="The configuration file to use. Defaults to “./blackboard_collaborate.ini”.",
         default=Path("./blackboard_collaborate.ini").open("rt"),
     )
+    argparser.add_argument(
+        "-s",
+        "--shared",
+        action="store_true",
+        help="Keep geckodriver running after the browser closes, and reuse it for the next launch.",
+    )
 
     arguments = argparser.parse_args()
 
-    conf = ConfigParser(
-        default_section="General",
-        interpolation=BooleanCoercingInterpolation(),
-    )
-    conf.read_file(arguments.config)
+    ini = FastIni()
+    section = ini.section(ini.read(arguments.config), arguments.class_name)
+    if arguments.shared:
+        section["shared"] = True
 
+    exit_on_sigterm()
     try:
-        BlackboardCollaborate.run_all(**conf[arguments.class_name])
+        BlackboardCollaborate.run_all(**section)
     except TypeError:
         print(
             f"You appear to be missing some REQUIRED configuration keys. Please edit {arguments.config.name} and try again. \n"